@@ -1,13 +1,30 @@
 """
 Documentation Generator Interface
 """
+import atexit
+import bisect
 import logging
 import os
+import queue
+import threading
+import weakref
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional, Union
 
 logger = logging.getLogger(__name__)
 
+# Seconds an idle background writer waits for more files before its thread ends
+_WRITER_IDLE_SECONDS = 1.0
+
+# Generators whose queued files are written out at interpreter exit
+_open_generators = weakref.WeakSet()
+
+@atexit.register
+def _close_open_generators():
+    """Write out files still queued by generators nobody closed"""
+    for generator in list(_open_generators):
+        generator.close()
+
 class DocGenerator(ABC):
     """
     Abstract base class for documentation generators
@@ -24,10 +41,26 @@ class DocGenerator(ABC):
         self.output_dir = output_dir
         self.template_dir = template_dir
         
+        # Output paths computed by _get_output_path, keyed by source file path
+        self._output_paths = {}
+        
+        # Documentation paths relative to output_dir, recorded as files are generated
+        self._rel_paths = {}
+        self._rel_paths_lock = threading.Lock()
+        
         # Ensure output directory exists
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
+        # Background writer so disk flushes overlap with documentation generation.
+        # The thread and its queue are created on demand; the thread is not a
+        # daemon, so queued files are written before the interpreter exits, and
+        # it ends once idle or closed.
+        self._write_queue = None
+        self._writer_thread = None
+        self._writer_lock = threading.Lock()
+        _open_generators.add(self)
+        
         logger.debug(f"Initialized {self.__class__.__name__} with output_dir: {output_dir}")
     
     @abstractmethod
@@ -58,10 +91,149 @@ class DocGenerator(ABC):
         """
         pass
     
+    def _build_file_tree(self, source_files: List[str]) -> Dict[str, List[str]]:
+        """
+        Group source files by directory, keeping each directory's files sorted
+        
+        Args:
+            source_files (list): List of source file paths
+            
+        Returns:
+            dict: Sorted file paths keyed by directory
+        """
+        file_tree = {}
+        for file_path in source_files:
+            bisect.insort(file_tree.setdefault(os.path.dirname(file_path), []), file_path)
+        return file_tree
+    
+    def flush(self) -> None:
+        """
+        Block until all queued documentation files have been written to disk
+        """
+        self.close()
+    
+    def close(self) -> None:
+        """
+        Write out queued documentation files and stop the background writer
+        
+        Files queued afterwards start a new writer thread.
+        """
+        with self._writer_lock:
+            thread, write_queue = self._writer_thread, self._write_queue
+            if thread is None:
+                return
+            self._writer_thread = self._write_queue = None
+            write_queue.put(None)
+        thread.join()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _write_output(self, output_path: str, content: Union[str, Iterable[str]]) -> None:
+        """
+        Queue a documentation file to be written by the background writer
+        
+        Args:
+            output_path (str): Path of the file to write
+            content (str or iterable): File content, whole or as a sequence of chunks
+        """
+        if isinstance(content, str):
+            content = (content,)
+        with self._writer_lock:
+            if self._writer_thread is None:
+                self._write_queue = queue.Queue(maxsize=64)
+                self._writer_thread = threading.Thread(
+                    target=self._write_worker,
+                    args=(self._write_queue,),
+                    name=f"{self.__class__.__name__}-writer"
+                )
+                self._writer_thread.start()
+            self._write_queue.put((output_path, content))
+    
+    def _write_worker(self, write_queue: queue.Queue) -> None:
+        """
+        Write queued documentation files until closed or idle
+        
+        Args:
+            write_queue (queue.Queue): Queue owned by this writer thread
+        """
+        while True:
+            try:
+                item = write_queue.get(timeout=_WRITER_IDLE_SECONDS)
+            except queue.Empty:
+                # Files are only queued under the lock, so a queue found empty
+                # here is retired before anything else can be put on it
+                with self._writer_lock:
+                    if write_queue is self._write_queue and write_queue.empty():
+                        self._writer_thread = self._write_queue = None
+                        return
+                continue
+            
+            if item is None:
+                return
+            
+            output_path, chunks = item
+            try:
+                # Each chunk is encoded once and handed to the file's own buffer
+                with open(output_path, 'wb') as f:
+                    f.writelines(chunk.encode('utf-8') for chunk in chunks)
+            except Exception as e:
+                logger.error(f"Error writing documentation file {output_path}: {str(e)}")
+    
+    def _get_relative_doc_path(self, file_path: str) -> str:
+        """
+        Get the documentation path for a source file relative to the output directory
+        
+        Args:
+            file_path (str): Relative path to the source file
+            
+        Returns:
+            str: Documentation path relative to output_dir
+        """
+        rel_path = self._rel_paths.get(file_path)
+        if rel_path is None:
+            rel_path = self._record_rel_path(file_path, self._get_output_path(file_path))
+        return rel_path
+    
+    def _record_rel_path(self, file_path: str, output_path: str) -> str:
+        """
+        Record the documentation path of a source file relative to the output directory
+        
+        Args:
+            file_path (str): Relative path to the source file
+            output_path (str): Path to the output documentation file
+            
+        Returns:
+            str: Documentation path relative to output_dir
+        """
+        rel_path = os.path.relpath(output_path, self.output_dir)
+        with self._rel_paths_lock:
+            self._rel_paths[file_path] = rel_path
+        return rel_path
+    
     def _get_output_path(self, file_path: str) -> str:
         """
         Get the output file path for a source file
         
+        Args:
+            file_path (str): Relative path to the source file
+            
+        Returns:
+            str: Path to the output documentation file
+        """
+        output_path = self._output_paths.get(file_path)
+        if output_path is None:
+            output_path = self._compute_output_path(file_path)
+            self._output_paths[file_path] = output_path
+        return output_path
+    
+    def _compute_output_path(self, file_path: str) -> str:
+        """
+        Build the output file path for a source file and create its directory
+        
         Args:
             file_path (str): Relative path to the source file
             
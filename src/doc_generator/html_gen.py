@@ -28,6 +28,9 @@ class HTMLGenerator(DocGenerator):
         """
         super().__init__(output_dir, template_dir)
         
+        # Generation date shown in every file; a run never spans enough time to matter
+        self._today = datetime.now().strftime('%Y-%m-%d')
+        
         # Load templates if available
         self.page_template = self._load_template('page.html') or self._default_page_template()
         self.index_template = self._load_template('index.html') or self._default_index_template()
@@ -47,6 +50,7 @@ class HTMLGenerator(DocGenerator):
             str: Path to the generated documentation file
         """
         output_path = self._get_output_path(file_path)
+        self._record_rel_path(file_path, output_path)
         
         # Create markdown content
         md_content = self._generate_markdown_content(file_path, documentation)
@@ -68,17 +72,13 @@ class HTMLGenerator(DocGenerator):
             title=title,
             content=html_content,
             file_path=file_path,
-            date=datetime.now().strftime('%Y-%m-%d'),
+            date=self._today,
             nav=self._generate_nav_html(file_path)
         )
         
-        # Write to file
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_doc)
-            logger.info(f"Generated HTML documentation for {file_path} at {output_path}")
-        except Exception as e:
-            logger.error(f"Error writing HTML file {output_path}: {str(e)}")
+        # Hand off to the background writer
+        self._write_output(output_path, html_doc)
+        logger.info(f"Generated HTML documentation for {file_path} at {output_path}")
         
         return output_path
     
@@ -99,24 +99,18 @@ class HTMLGenerator(DocGenerator):
         md_content = f"# {project_name} Documentation\n\n"
         
         # Organize files by directory
-        file_tree = {}
-        for file_path in source_files:
-            directory = os.path.dirname(file_path)
-            if directory not in file_tree:
-                file_tree[directory] = []
-            file_tree[directory].append(file_path)
+        file_tree = self._build_file_tree(source_files)
         
         # Generate file links
-        for directory, files in sorted(file_tree.items()):
+        for directory in sorted(file_tree):
             if directory:
                 md_content += f"## {directory}/\n\n"
             else:
                 md_content += "## Root\n\n"
             
-            for file_path in sorted(files):
+            for file_path in file_tree[directory]:
                 base_name = os.path.basename(file_path)
-                doc_path = self._get_output_path(file_path)
-                rel_path = os.path.relpath(doc_path, self.output_dir)
+                rel_path = self._get_relative_doc_path(file_path)
                 
                 md_content += f"- [{base_name}]({rel_path})\n"
             
@@ -133,16 +127,12 @@ class HTMLGenerator(DocGenerator):
             title=f"{project_name} Documentation",
             project_name=project_name,
             content=html_content,
-            date=datetime.now().strftime('%Y-%m-%d')
+            date=self._today
         )
         
-        # Write to file
-        try:
-            with open(index_path, 'w', encoding='utf-8') as f:
-                f.write(html_doc)
-            logger.info(f"Generated HTML index file at {index_path}")
-        except Exception as e:
-            logger.error(f"Error writing HTML index file {index_path}: {str(e)}")
+        # Hand off to the background writer
+        self._write_output(index_path, html_doc)
+        logger.info(f"Generated HTML index file at {index_path}")
         
         return index_path
     
@@ -1,16 +1,38 @@
 """
 Markdown Documentation Generator
 """
+import functools
 import logging
 import os
-import re
+import string
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+
+from jinja2 import Environment, Template
 
 from src.doc_generator.generator import DocGenerator
 
 logger = logging.getLogger(__name__)
 
+# Parameter line formats keyed by (has_type, has_default)
+_PARAM_FMT = {
+    (True, True): "- **{n}** (*{t}*, default: `{d}`)\n",
+    (True, False): "- **{n}** (*{t}*)\n",
+    (False, True): "- **{n}** (default: `{d}`)\n",
+    (False, False): "- **{n}**\n",
+}
+
+# Jinja2 expression producing a literal "{", so legacy text can't open a tag
+_JINJA_OPEN_BRACE = "{{ '{' }}"
+
+# Import line formats keyed by (is_from_import, has_alias)
+_IMPORT_FMT = {
+    (True, True): "- `from {module} import {name} as {asname}`\n",
+    (True, False): "- `from {module} import {name}`\n",
+    (False, True): "- `import {name} as {asname}`\n",
+    (False, False): "- `import {name}`\n",
+}
+
 class MarkdownGenerator(DocGenerator):
     """
     Generator for Markdown documentation
@@ -26,11 +48,36 @@ class MarkdownGenerator(DocGenerator):
         """
         super().__init__(output_dir, template_dir)
         
+        # Generation date shown in every file; a run never spans enough time to matter
+        self._today = datetime.now().strftime('%Y-%m-%d')
+        
+        # Templates are compiled once and never reloaded during a run
+        self._env = Environment(
+            auto_reload=False,
+            cache_size=400,
+            autoescape=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True
+        )
+        
         # Load templates if available
-        self.file_template = self._load_template('file.md') or self._default_file_template()
-        self.index_template = self._load_template('index.md') or self._default_index_template()
-        self.class_template = self._load_template('class.md') or self._default_class_template()
-        self.function_template = self._load_template('function.md') or self._default_function_template()
+        file_source = self._load_template('file.md') or self._default_file_template()
+        self.file_template = self._compile_template(file_source)
+        self.index_template = self._compile_template(
+            self._load_template('index.md') or self._default_index_template())
+        self.class_template = self._compile_template(
+            self._load_template('class.md') or self._default_class_template())
+        self.function_template = self._compile_template(
+            self._load_template('function.md') or self._default_function_template())
+        
+        # A file template without placeholders renders verbatim for every file
+        self._static_file_doc = file_source if '{' not in file_source else None
+        
+        # Memoize symbol rendering per instance; duplicate signatures render identical markdown
+        self._render_function = functools.lru_cache(maxsize=4096)(self._render_function)
+        self._render_class = functools.lru_cache(maxsize=4096)(self._render_class)
+        self._render_variable = functools.lru_cache(maxsize=4096)(self._render_variable)
     
     def generate(self, file_path: str, documentation: Dict[str, Any]) -> str:
         """
@@ -44,6 +91,13 @@ class MarkdownGenerator(DocGenerator):
             str: Path to the generated documentation file
         """
         output_path = self._get_output_path(file_path)
+        self._record_rel_path(file_path, output_path)
+        
+        # Nothing to substitute, so skip rendering the sections entirely
+        if self._static_file_doc is not None:
+            self._write_output(output_path, self._static_file_doc)
+            logger.info(f"Generated documentation for {file_path} at {output_path}")
+            return output_path
         
         # Get module information
         module_info = documentation.get('module', {})
@@ -72,25 +126,21 @@ class MarkdownGenerator(DocGenerator):
         # Process imports
         imports_md = self._generate_imports_doc(documentation.get('imports', []))
         
-        # Format the file documentation
-        file_doc = self.file_template.format(
+        # Format the file documentation as chunks; the writer encodes them without joining
+        file_doc = list(self.file_template.generate(
             file_path=file_path,
             module_name=module_name,
-            date=datetime.now().strftime('%Y-%m-%d'),
+            date=self._today,
             module_doc=module_doc,
             classes=classes_md,
             functions=functions_md,
             variables=variables_md,
             imports=imports_md
-        )
+        ))
         
-        # Write to file
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(file_doc)
-            logger.info(f"Generated documentation for {file_path} at {output_path}")
-        except Exception as e:
-            logger.error(f"Error writing documentation file {output_path}: {str(e)}")
+        # Hand off to the background writer
+        self._write_output(output_path, file_doc)
+        logger.info(f"Generated documentation for {file_path} at {output_path}")
         
         return output_path
     
@@ -108,48 +158,85 @@ class MarkdownGenerator(DocGenerator):
         index_path = os.path.join(self.output_dir, 'index.md')
         
         # Organize files by directory
-        file_tree = {}
-        for file_path in source_files:
-            directory = os.path.dirname(file_path)
-            if directory not in file_tree:
-                file_tree[directory] = []
-            file_tree[directory].append(file_path)
+        file_tree = self._build_file_tree(source_files)
         
         # Generate file links
         files_md = ""
         
-        for directory, files in sorted(file_tree.items()):
+        for directory in sorted(file_tree):
             if directory:
                 files_md += f"### {directory}/\n\n"
             else:
                 files_md += "### Root\n\n"
             
-            for file_path in sorted(files):
+            for file_path in file_tree[directory]:
                 base_name = os.path.basename(file_path)
-                doc_path = self._get_output_path(file_path)
-                rel_path = os.path.relpath(doc_path, self.output_dir)
+                rel_path = self._get_relative_doc_path(file_path)
                 
                 files_md += f"- [{base_name}]({rel_path})\n"
             
             files_md += "\n"
         
         # Format the index file
-        index_doc = self.index_template.format(
+        index_doc = self.index_template.render(
             project_name=project_name,
-            date=datetime.now().strftime('%Y-%m-%d'),
+            date=self._today,
             files=files_md
         )
         
-        # Write to file
-        try:
-            with open(index_path, 'w', encoding='utf-8') as f:
-                f.write(index_doc)
-            logger.info(f"Generated index file at {index_path}")
-        except Exception as e:
-            logger.error(f"Error writing index file {index_path}: {str(e)}")
+        # Hand off to the background writer
+        self._write_output(index_path, index_doc)
+        logger.info(f"Generated index file at {index_path}")
         
         return index_path
     
+    def _compile_template(self, source: str) -> Template:
+        """
+        Compile a Jinja2 template, accepting legacy str.format-style templates
+        
+        Templates that parse as the older str.format style, with at least one
+        plain ``{placeholder}`` field, are converted: fields become
+        ``{{ placeholder }}`` and every literal "{" (including ``{{`` escapes)
+        is emitted as a Jinja2 expression, so no literal text can open a
+        Jinja2 tag, comment or expression.
+        
+        Args:
+            source (str): Template source
+            
+        Returns:
+            Template: Compiled template
+        """
+        legacy = self._convert_legacy_template(source)
+        return self._env.from_string(source if legacy is None else legacy)
+    
+    @staticmethod
+    def _convert_legacy_template(source: str) -> Optional[str]:
+        """
+        Convert a str.format-style template to Jinja2 syntax
+        
+        Args:
+            source (str): Template source
+            
+        Returns:
+            str or None: Jinja2 source, or None if source is not a legacy template
+        """
+        try:
+            pieces = list(string.Formatter().parse(source))
+        except ValueError:
+            return None
+        
+        fields = [piece for piece in pieces if piece[1] is not None]
+        if not fields or any(not field.isidentifier() or spec or conversion
+                             for _, field, spec, conversion in fields):
+            return None
+        
+        parts = []
+        for literal, field, _, _ in pieces:
+            parts.append(literal.replace('{', _JINJA_OPEN_BRACE))
+            if field is not None:
+                parts.append(f"{{{{ {field} }}}}")
+        return "".join(parts)
+    
     def _get_extension(self) -> str:
         """
         Get the file extension for Markdown
@@ -169,65 +256,150 @@ class MarkdownGenerator(DocGenerator):
         Returns:
             str: Markdown documentation
         """
-        # Process class documentation
-        class_name = cls.get('name', '')
-        doc = cls.get('documentation', cls.get('docstring', ''))
+        return self._render_class(self._class_key(cls))
+    
+    def _generate_function_doc(self, func: Dict[str, Any], is_method: bool = False) -> str:
+        """
+        Generate documentation for a function
+        
+        Args:
+            func (dict): Function information
+            is_method (bool): Whether this is a class method
+            
+        Returns:
+            str: Markdown documentation
+        """
+        return self._render_function(self._function_key(func, is_method))
+    
+    def _generate_variable_doc(self, var: Dict[str, Any], is_attribute: bool = False) -> str:
+        """
+        Generate documentation for a variable
+        
+        Args:
+            var (dict): Variable information
+            is_attribute (bool): Whether this is a class attribute
+            
+        Returns:
+            str: Markdown documentation
+        """
+        return self._render_variable(self._variable_key(var, is_attribute))
+    
+    @staticmethod
+    def _function_key(func: Dict[str, Any], is_method: bool = False) -> Tuple:
+        """
+        Build a hashable cache key from the rendered parts of a function
+        
+        Args:
+            func (dict): Function information
+            is_method (bool): Whether this is a class method
+            
+        Returns:
+            tuple: Cache key for the function renderer
+        """
+        params = tuple(
+            (p.get('name', ''), p.get('annotation', ''), p.get('default', ''))
+            for p in func.get('parameters', [])
+        )
+        return (
+            func.get('name', ''),
+            func.get('class_name', ''),
+            params,
+            func.get('returns', ''),
+            func.get('documentation', func.get('docstring', '')),
+            is_method
+        )
+    
+    def _class_key(self, cls: Dict[str, Any]) -> Tuple:
+        """
+        Build a hashable cache key from the rendered parts of a class
+        
+        Args:
+            cls (dict): Class information
+            
+        Returns:
+            tuple: Cache key for the class renderer
+        """
+        return (
+            cls.get('name', ''),
+            tuple(cls.get('bases', [])),
+            cls.get('documentation', cls.get('docstring', '')),
+            tuple(self._function_key(m, is_method=True) for m in cls.get('methods', [])),
+            tuple(self._variable_key(a, is_attribute=True) for a in cls.get('attributes', []))
+        )
+    
+    @staticmethod
+    def _variable_key(var: Dict[str, Any], is_attribute: bool = False) -> Tuple:
+        """
+        Build a hashable cache key from the rendered parts of a variable
+        
+        Args:
+            var (dict): Variable information
+            is_attribute (bool): Whether this is a class attribute
+            
+        Returns:
+            tuple: Cache key for the variable renderer
+        """
+        return (
+            var.get('name', ''),
+            var.get('class_name', ''),
+            var.get('annotation', ''),
+            var.get('value', ''),
+            var.get('documentation', ''),
+            is_attribute
+        )
+    
+    def _render_class(self, key: Tuple) -> str:
+        """
+        Render class markdown from its cache key
+        
+        Args:
+            key (tuple): Key built by _class_key
+            
+        Returns:
+            str: Markdown documentation
+        """
+        class_name, bases, doc, method_keys, attribute_keys = key
         
         # Process methods
         methods_md = ""
-        for method in cls.get('methods', []):
-            methods_md += self._generate_function_doc(method, is_method=True) + "\n\n"
+        for method_key in method_keys:
+            methods_md += self._render_function(method_key) + "\n\n"
         
         # Process attributes
         attributes_md = ""
-        for attr in cls.get('attributes', []):
-            attributes_md += self._generate_variable_doc(attr, is_attribute=True) + "\n\n"
+        for attribute_key in attribute_keys:
+            attributes_md += self._render_variable(attribute_key) + "\n\n"
         
         # Format the class documentation
-        return self.class_template.format(
+        return self.class_template.render(
             class_name=class_name,
-            bases=", ".join(cls.get('bases', [])),
+            bases=", ".join(bases),
             doc=doc,
             methods=methods_md,
             attributes=attributes_md
         )
     
-    def _generate_function_doc(self, func: Dict[str, Any], is_method: bool = False) -> str:
+    def _render_function(self, key: Tuple) -> str:
         """
-        Generate documentation for a function
+        Render function markdown from its cache key
         
         Args:
-            func (dict): Function information
-            is_method (bool): Whether this is a class method
+            key (tuple): Key built by _function_key
             
         Returns:
             str: Markdown documentation
         """
-        # Process function documentation
-        func_name = func.get('name', '')
-        class_name = func.get('class_name', '')
-        doc = func.get('documentation', func.get('docstring', ''))
+        func_name, class_name, params, returns, doc, is_method = key
         
         # Process parameters
-        params_md = ""
-        for param in func.get('parameters', []):
-            param_name = param.get('name', '')
-            param_type = param.get('annotation', '')
-            param_default = param.get('default', '')
-            
-            if param_type:
-                if param_default:
-                    params_md += f"- **{param_name}** (*{param_type}*, default: `{param_default}`)\n"
-                else:
-                    params_md += f"- **{param_name}** (*{param_type}*)\n"
-            else:
-                if param_default:
-                    params_md += f"- **{param_name}** (default: `{param_default}`)\n"
-                else:
-                    params_md += f"- **{param_name}**\n"
+        params_md = "".join(
+            _PARAM_FMT[(bool(param_type), bool(param_default))].format(
+                n=param_name, t=param_type, d=param_default
+            )
+            for param_name, param_type, param_default in params
+        )
         
         # Process return type
-        returns = func.get('returns', '')
         if returns:
             returns_md = f"**Returns**: *{returns}*"
         else:
@@ -237,7 +409,7 @@ class MarkdownGenerator(DocGenerator):
         prefix = "Method" if is_method else "Function"
         qualified_name = f"{class_name}.{func_name}" if class_name and is_method else func_name
         
-        return self.function_template.format(
+        return self.function_template.render(
             prefix=prefix,
             qualified_name=qualified_name,
             func_name=func_name,
@@ -246,42 +418,31 @@ class MarkdownGenerator(DocGenerator):
             returns=returns_md
         )
     
-    def _generate_variable_doc(self, var: Dict[str, Any], is_attribute: bool = False) -> str:
+    def _render_variable(self, key: Tuple) -> str:
         """
-        Generate documentation for a variable
+        Render variable markdown from its cache key
         
         Args:
-            var (dict): Variable information
-            is_attribute (bool): Whether this is a class attribute
+            key (tuple): Key built by _variable_key
             
         Returns:
             str: Markdown documentation
         """
-        # Process variable documentation
-        var_name = var.get('name', '')
-        class_name = var.get('class_name', '')
-        annotation = var.get('annotation', '')
-        value = var.get('value', '')
-        
-        # Format type and value
-        if annotation:
-            type_info = f"*{annotation}*"
-        else:
-            type_info = ""
-        
-        if value and str(value) != "None":
-            value_info = f"= `{value}`"
-        else:
-            value_info = ""
+        var_name, class_name, annotation, value, doc, is_attribute = key
         
         prefix = "Attribute" if is_attribute else "Variable"
         qualified_name = f"{class_name}.{var_name}" if class_name and is_attribute else var_name
         
         # Format the variable documentation
-        return f"### {prefix}: `{qualified_name}`\n\n" + \
-               (f"**Type**: {type_info}\n\n" if type_info else "") + \
-               (f"**Default**: {value_info}\n\n" if value_info else "") + \
-               (var.get('documentation', '') if 'documentation' in var else "")
+        parts = [f"### {prefix}: `{qualified_name}`"]
+        if annotation:
+            parts.append(f"**Type**: *{annotation}*")
+        if value not in (None, "None", ""):
+            parts.append(f"**Default**: = `{value}`")
+        if doc:
+            parts.append(doc)
+        
+        return "\n\n".join(parts)
     
     def _generate_imports_doc(self, imports: List[Dict[str, Any]]) -> str:
         """
@@ -296,28 +457,17 @@ class MarkdownGenerator(DocGenerator):
         if not imports:
             return ""
         
-        imports_md = "## Imports\n\n"
+        parts = ["## Imports\n\n"]
         
         for imp in imports:
-            if imp.get('type') == 'from':
-                module = imp.get('module', '')
-                name = imp.get('name', '')
-                asname = imp.get('asname', '')
-                
-                if asname:
-                    imports_md += f"- `from {module} import {name} as {asname}`\n"
-                else:
-                    imports_md += f"- `from {module} import {name}`\n"
-            else:
-                name = imp.get('name', '')
-                asname = imp.get('asname', '')
-                
-                if asname:
-                    imports_md += f"- `import {name} as {asname}`\n"
-                else:
-                    imports_md += f"- `import {name}`\n"
-        
-        return imports_md
+            asname = imp.get('asname', '')
+            parts.append(_IMPORT_FMT[(imp.get('type') == 'from', bool(asname))].format(
+                module=imp.get('module', ''),
+                name=imp.get('name', ''),
+                asname=asname
+            ))
+        
+        return "".join(parts)
     
     def _default_file_template(self) -> str:
         """
@@ -326,21 +476,31 @@ class MarkdownGenerator(DocGenerator):
         Returns:
             str: Default template
         """
-        return """# {module_name}
+        return """# {{ module_name }}
 
-*File: {file_path}*
+*File: {{ file_path }}*
 
-*Generated: {date}*
+*Generated: {{ date }}*
 
-{module_doc}
+{% if module_doc %}
+{{ module_doc }}
 
-{imports}
+{% endif %}
+{% if imports %}
+{{ imports }}
 
-{classes}
+{% endif %}
+{% if classes %}
+{{ classes }}
 
-{functions}
+{% endif %}
+{% if functions %}
+{{ functions }}
 
-{variables}
+{% endif %}
+{% if variables %}
+{{ variables }}
+{% endif %}
 """
     
     def _default_index_template(self) -> str:
@@ -350,13 +510,13 @@ class MarkdownGenerator(DocGenerator):
         Returns:
             str: Default template
         """
-        return """# {project_name} Documentation
+        return """# {{ project_name }} Documentation
 
-*Generated: {date}*
+*Generated: {{ date }}*
 
 ## Files
 
-{files}
+{{ files }}
 """
     
     def _default_class_template(self) -> str:
@@ -366,13 +526,17 @@ class MarkdownGenerator(DocGenerator):
         Returns:
             str: Default template
         """
-        return """## Class: `{class_name}`
+        return """## Class: `{{ class_name }}`
 
-{doc}
+{{ doc }}
 
-{attributes}
+{% if attributes %}
+{{ attributes }}
 
-{methods}
+{% endif %}
+{% if methods %}
+{{ methods }}
+{% endif %}
 """
     
     def _default_function_template(self) -> str:
@@ -382,12 +546,16 @@ class MarkdownGenerator(DocGenerator):
         Returns:
             str: Default template
         """
-        return """### {prefix}: `{qualified_name}`
+        return """### {{ prefix }}: `{{ qualified_name }}`
 
-{doc}
+{{ doc }}
 
+{% if parameters %}
 **Parameters**:
-{parameters}
+{{ parameters }}
 
-{returns}
+{% endif %}
+{% if returns %}
+{{ returns }}
+{% endif %}
 """
\ No newline at end of file
@@ -3,6 +3,7 @@ Llama LLM Handler Implementation
 """
 import logging
 import os
+import re
 from typing import Dict, Any, Optional
 
 from src.llm.llm_interface import LLMInterface
@@ -14,6 +15,16 @@ class LlamaHandler(LLMInterface):
     Handler for Llama models using llama-cpp-python
     """
     
+    # Completion endings stripped from responses, matched in a single pass
+    _END_RE = re.compile(r'</answer>|Human:|User:|Assistant:|\n\n\n')
+    
+    # Formatting artifact removed before markers are looked for
+    _INST_TAG = "[/INST]"
+    
+    # Rescan this many trailing characters so markers split across checks, or
+    # joined up by a later [/INST] removal, are found
+    _END_MARKER_OVERLAP = len("</answer>") + len(_INST_TAG)
+    
     def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None):
         """
         Initialize the Llama handler
@@ -27,8 +38,14 @@ class LlamaHandler(LLMInterface):
         # Llama-specific parameters
         self.n_ctx = self.config.get('context_length', 4096)
         self.n_batch = self.config.get('batch_size', 512)
-        self.n_gpu_layers = self.config.get('gpu_layers', -1)  # -1 means auto-detect
+        self.n_gpu_layers = self.config.get('n_gpu_layers', self.config.get('gpu_layers', -1))  # -1 means auto-detect
         self.quantization = self.config.get('quantization', 'q4_0')
+        self.stream_check_interval = self.config.get('stream_check_interval', 8)
+        self.cache_prompt = self.config.get('cache_prompt', True)
+        self.prompt_cache_bytes = self.config.get('prompt_cache_bytes', 2 << 30)
+        
+        # The prompt envelope is fixed after construction; build its halves once
+        self._prompt_head, self._prompt_tail = self._build_prompt_envelope()
         
         # Initialize model on creation if specified
         if self.config.get('load_on_init', True):
@@ -72,6 +89,16 @@ class LlamaHandler(LLMInterface):
                 verbose=self.config.get('verbose', False)
             )
             
+            # Keep evaluated prompt states so prompts sharing the template prefix
+            # skip re-evaluating it
+            if self.cache_prompt:
+                try:
+                    from llama_cpp import LlamaRAMCache
+                except ImportError:
+                    logger.warning("This llama-cpp-python build has no LlamaRAMCache; prompt caching disabled")
+                else:
+                    self.model.set_cache(LlamaRAMCache(capacity_bytes=self.prompt_cache_bytes))
+            
             logger.info("Llama model loaded successfully")
             return True
             
@@ -91,7 +118,8 @@ class LlamaHandler(LLMInterface):
             str: Generated text
         """
         # Check for cached response
-        cached_response = self.get_cached_response(prompt)
+        prompt_hash = self._hash_prompt(prompt)
+        cached_response = self.get_cached_response(prompt_hash)
         if cached_response is not None:
             return cached_response
         
@@ -109,27 +137,23 @@ class LlamaHandler(LLMInterface):
             log_prompt = formatted_prompt[:100] + "..." if len(formatted_prompt) > 100 else formatted_prompt
             logger.debug(f"Generating with prompt: {log_prompt}")
             
-            # Generate the response
-            response = self.model.create_completion(
+            # Stream the response so decoding stops at the first end marker
+            stream = self.model.create_completion(
                 formatted_prompt,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
                 top_p=self.top_p,
                 stop=self.config.get('stop_sequences', ["</answer>", "Human:", "User:"]),
-                echo=self.config.get('echo', False)
+                echo=self.config.get('echo', False),
+                stream=True
             )
-            
-            # Extract the text from the response
-            if response and "choices" in response and len(response["choices"]) > 0:
-                text = response["choices"][0]["text"].strip()
-            else:
-                text = ""
+            text = self._collect_stream(stream).strip()
             
             # Clean up response if needed
             text = self._clean_response(text)
             
             # Save to cache
-            self.save_to_cache(prompt, text)
+            self.save_to_cache(prompt_hash, text)
             
             return text
             
@@ -137,6 +161,36 @@ class LlamaHandler(LLMInterface):
             logger.error(f"Error during text generation: {str(e)}")
             return f"Error generating documentation: {str(e)}"
     
+    def _collect_stream(self, stream) -> str:
+        """
+        Accumulate streamed completion chunks until an end marker appears
+        
+        Args:
+            stream (iterator): Chunks from create_completion(stream=True)
+            
+        Returns:
+            str: Generated text, possibly ending in an end marker
+        """
+        pieces = []
+        checked = 0
+        
+        for count, chunk in enumerate(stream, 1):
+            choices = chunk.get("choices")
+            if choices:
+                pieces.append(choices[0]["text"])
+            
+            # Only scan every few tokens; _clean_response trims the marker itself.
+            # The scan sees the text the way _clean_response does: without
+            # [/INST] and past the leading whitespace it strips.
+            if count % self.stream_check_interval == 0:
+                text = "".join(pieces).replace(self._INST_TAG, "")
+                start = max(len(text) - len(text.lstrip()), checked - self._END_MARKER_OVERLAP)
+                if self._END_RE.search(text, start):
+                    break
+                checked = len(text)
+        
+        return "".join(pieces)
+    
     def _format_prompt(self, prompt: str) -> str:
         """
         Format the prompt for the Llama model
@@ -147,6 +201,15 @@ class LlamaHandler(LLMInterface):
         Returns:
             str: Formatted prompt
         """
+        return self._prompt_head + prompt + self._prompt_tail
+    
+    def _build_prompt_envelope(self):
+        """
+        Build the constant text placed before and after every prompt
+        
+        Returns:
+            tuple: (head, tail) strings wrapped around the prompt
+        """
         # Use the system prompt template if provided
         system_prompt = self.config.get('system_prompt', 
             "You are an expert technical writer specializing in code documentation.")
@@ -157,15 +220,11 @@ class LlamaHandler(LLMInterface):
         
         # For Llama 2 Chat models
         if self.config.get('chat_format', 'llama2') == 'llama2':
-            return f"""<s>[INST] <<SYS>>
-{system_prompt}
-<</SYS>>
-
-{prompt_prefix}{prompt}{prompt_suffix} [/INST]
-"""
+            head = f"<s>[INST] <<SYS>>\n{system_prompt}\n<</SYS>>\n\n{prompt_prefix}"
+            return head, f"{prompt_suffix} [/INST]\n"
         # For simpler format
         else:
-            return f"{system_prompt}\n\n{prompt_prefix}{prompt}{prompt_suffix}\n"
+            return f"{system_prompt}\n\n{prompt_prefix}", f"{prompt_suffix}\n"
     
     def _clean_response(self, text: str) -> str:
         """
@@ -178,12 +237,11 @@ class LlamaHandler(LLMInterface):
             str: Cleaned response text
         """
         # Remove any model formatting artifacts
-        text = text.replace("[/INST]", "").strip()
+        text = text.replace(self._INST_TAG, "").strip()
         
-        # Remove common completion endings
-        end_markers = ["</answer>", "Human:", "User:", "Assistant:", "\n\n\n"]
-        for marker in end_markers:
-            if marker in text:
-                text = text.split(marker)[0].strip()
+        # Cut at the earliest completion ending
+        match = self._END_RE.search(text)
+        if match:
+            text = text[:match.start()].strip()
         
         return text
\ No newline at end of file
@@ -1,13 +1,19 @@
 """
 LLM Interface for Auto Documentation Generator
 """
+import hashlib
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Handler classes resolved by LLMFactory, keyed by LLM type
+_HANDLERS = {}
+
 class LLMInterface(ABC):
     """
     Abstract base class for LLM interactions
@@ -35,6 +41,25 @@ class LLMInterface(ABC):
         # Cache settings
         self.cache_dir = self.config.get('cache_dir', 'cache')
         self.use_cache = self.config.get('use_cache', True)
+        self.mem_cache_size = self.config.get('mem_cache_size', 10000)
+        self.cache_max_temperature = self.config.get('cache_max_temperature', 0.2)
+        
+        # Sampled output at higher temperatures is not worth replaying
+        if self.use_cache and self.temperature > self.cache_max_temperature:
+            logger.info(f"Response cache disabled: temperature {self.temperature} "
+                        f"exceeds cache_max_temperature {self.cache_max_temperature}")
+            self.use_cache = False
+        
+        # In-process LRU in front of the disk cache, keyed by prompt hash. It is
+        # read and written from both the event loop and executor threads.
+        self._mem_cache = OrderedDict()
+        self._mem_cache_lock = threading.Lock()
+        
+        # Cache keys include the model, so switching models never replays old answers
+        self._hash_seed = hashlib.blake2b(model_path.encode('utf-8') + b'\0', digest_size=16)
+        
+        # Shard directories already created under cache_dir
+        self._cache_shards = set()
         
         if self.use_cache and not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
@@ -64,59 +89,129 @@ class LLMInterface(ABC):
         """
         pass
     
-    def get_cached_response(self, prompt: str) -> Optional[str]:
+    def generate_batch(self, prompts: List[str]) -> List[str]:
         """
-        Get a cached response for a prompt if it exists
+        Generate text for several prompts
+        
+        Handlers whose backend can serve prompts together should override this;
+        the default generates them one by one.
+        
+        Args:
+            prompts (list): Input prompts
+            
+        Returns:
+            list: Generated text for each prompt, in order
+        """
+        return [self.generate(prompt) for prompt in prompts]
+    
+    def _hash_prompt(self, prompt: str) -> str:
+        """
+        Hash a prompt for use as a cache key
         
         Args:
             prompt (str): Input prompt
             
+        Returns:
+            str: Hex digest of the model path and prompt
+        """
+        hasher = self._hash_seed.copy()
+        hasher.update(prompt.encode('utf-8'))
+        return hasher.hexdigest()
+    
+    def _cache_file(self, prompt_hash: str) -> str:
+        """
+        Get the cache file path for a prompt hash
+        
+        Files are spread over subdirectories named after the first two hex
+        digits, keeping directory listings short on large caches.
+        
+        Args:
+            prompt_hash (str): Prompt hash from _hash_prompt
+            
+        Returns:
+            str: Path of the cache file
+        """
+        return os.path.join(self.cache_dir, prompt_hash[:2], f"{prompt_hash}.txt")
+    
+    def get_cached_response(self, prompt_hash: str) -> Optional[str]:
+        """
+        Get a cached response for a prompt if it exists
+        
+        Args:
+            prompt_hash (str): Prompt hash from _hash_prompt
+            
         Returns:
             str or None: Cached response or None if not found
         """
         if not self.use_cache:
             return None
         
-        import hashlib
+        # Check the in-process cache before touching the disk
+        with self._mem_cache_lock:
+            response = self._mem_cache.get(prompt_hash)
+            if response is not None:
+                self._mem_cache.move_to_end(prompt_hash)
+        if response is not None:
+            return response
         
-        # Create a hash of the prompt for the cache key
-        prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
-        cache_file = os.path.join(self.cache_dir, f"{prompt_hash}.txt")
+        cache_file = self._cache_file(prompt_hash)
         
         if os.path.exists(cache_file):
             try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
+                with open(cache_file, 'rb') as f:
                     logger.debug(f"Found cached response for prompt")
-                    return f.read()
+                    response = f.read().decode('utf-8')
+                self._remember(prompt_hash, response)
+                return response
             except Exception as e:
                 logger.warning(f"Error reading cache file: {e}")
         
         return None
     
-    def save_to_cache(self, prompt: str, response: str) -> None:
+    def save_to_cache(self, prompt_hash: str, response: str) -> None:
         """
         Save a response to the cache
         
         Args:
-            prompt (str): Input prompt
+            prompt_hash (str): Prompt hash from _hash_prompt
             response (str): Generated response
         """
         if not self.use_cache:
             return
         
-        import hashlib
-        
-        # Create a hash of the prompt for the cache key
-        prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
-        cache_file = os.path.join(self.cache_dir, f"{prompt_hash}.txt")
+        self._remember(prompt_hash, response)
+        cache_file = self._cache_file(prompt_hash)
         
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write(response)
+            shard = prompt_hash[:2]
+            if shard not in self._cache_shards:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                self._cache_shards.add(shard)
+            
+            # Write to a private temporary file and rename it into place, so
+            # readers never see a partially written response
+            tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(response.encode('utf-8'))
+            os.replace(tmp_file, cache_file)
             logger.debug(f"Saved response to cache")
         except Exception as e:
             logger.warning(f"Error writing to cache file: {e}")
     
+    def _remember(self, prompt_hash: str, response: str) -> None:
+        """
+        Store a response in the in-process cache, evicting the least recently used entry
+        
+        Args:
+            prompt_hash (str): Hash of the prompt
+            response (str): Generated response
+        """
+        with self._mem_cache_lock:
+            self._mem_cache[prompt_hash] = response
+            self._mem_cache.move_to_end(prompt_hash)
+            if len(self._mem_cache) > self.mem_cache_size:
+                self._mem_cache.popitem(last=False)
+    
     def cleanup(self):
         """
         Clean up resources
@@ -148,11 +243,14 @@ class LLMFactory:
         """
         llm_type = llm_type.lower()
         
-        if llm_type == 'llama':
-            from src.llm.llama_handler import LlamaHandler
-            return LlamaHandler(model_path, config)
-        elif llm_type == 'mistral':
-            from src.llm.mistral_handler import MistralHandler
-            return MistralHandler(model_path, config)
-        else:
-            raise ValueError(f"Unsupported LLM type: {llm_type}")
\ No newline at end of file
+        handler_cls = _HANDLERS.get(llm_type)
+        if handler_cls is None:
+            if llm_type == 'llama':
+                from src.llm.llama_handler import LlamaHandler as handler_cls
+            elif llm_type == 'mistral':
+                from src.llm.mistral_handler import MistralHandler as handler_cls
+            else:
+                raise ValueError(f"Unsupported LLM type: {llm_type}")
+            _HANDLERS[llm_type] = handler_cls
+        
+        return handler_cls(model_path, config)
\ No newline at end of file
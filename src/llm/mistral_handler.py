@@ -4,20 +4,180 @@ Mistral LLM Handler Implementation
 """
 Mistral LLM Handler Implementation with Chunking
 """
+import asyncio
+import concurrent.futures
+import functools
 import logging
 import os
+import queue
 import re
-from typing import Dict, Any, Optional
+import threading
+import weakref
+from typing import Dict, Any, Iterator, List, Optional
 
 from src.llm.llm_interface import LLMInterface
 
+try:
+    from ctransformers import AutoModelForCausalLM
+    _CT_AVAILABLE = True
+except ImportError:
+    AutoModelForCausalLM = None
+    _CT_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Patterns used to pull the essentials out of long prompts
+_NAME_RE = re.compile(r'name:?\s*([^\n\r]+)', re.IGNORECASE)
+_CLASS_RE = re.compile(r'class\s+(\w+)')
+_FUNC_RE = re.compile(r'def\s+(\w+)')
+# Each group is named after the prompt type its keywords map to
+_PROMPT_TYPE_RE = re.compile(
+    r'\b(?:(?P<class>class)|(?P<function>def |function)|(?P<variable>variable)|(?P<module>module))\b',
+    re.IGNORECASE)
+
+_DEFAULT_SYSTEM_PROMPT = "You are an expert technical writer specializing in P&C insurance code documentation."
+
+# Reduced prompts for the long-prompt fallback. The static instructions come
+# first so the tokens after the system prompt stay identical across requests
+# and can be reused by backends with prompt caching.
+_CONDENSED_TMPL = ("Generate documentation for the following code. "
+                   "Provide a comprehensive explanation in P&C insurance context.\n\n"
+                   "{ptype}: {name}\n\n"
+                   "Here's the essential part of the code:\n\n```python\n{code}\n```")
+_SIMPLE_TMPL = ("Briefly describe the following code element in P&C insurance context.\n\n"
+                "{ptype}: {name}")
+
+# Completion endings stripped from responses
+_END_MARKERS = ("</answer>", "Human:", "User:", "<|user|>", "<|system|>", "\n\n\n")
+
+# Characters held back while streaming: one less than the longest marker or tag
+_STREAM_HOLDBACK = max(len(marker) for marker in _END_MARKERS + ("[/INST]",)) - 1
+
+# Queued by the generation worker after the last token
+_STREAM_END = object()
+
+# Fallback documentation used when the model is unavailable
+_MOCK_CLASS_TMPL = """This class is part of the P&C insurance system.
+
+It provides functionality related to {name}, which is an important component
+for managing insurance policies, claims, or risk assessment. In the P&C insurance domain, 
+this handles processes critical to effective insurance operations.
+
+Key features include:
+- Processing and validation of insurance data
+- Support for standard P&C insurance workflows
+- Implementation of business rules for insurance calculations
+- Management of policy or claim information"""
+
+_MOCK_FUNCTION_TMPL = """This function handles {name} operations in the P&C insurance system.
+
+It performs calculations or data processing related to insurance policies or claims,
+ensuring proper validation and compliance with industry standards. The function 
+implements business logic for insurance operations according to P&C practices.
+
+Insurance domain importance:
+- Ensures accurate insurance calculations
+- Supports consistent insurance processing flows
+- Implements industry-standard methods for P&C insurance
+- Provides key functionality for policy or claims management"""
+
+_MOCK_VARIABLE_TMPL = """This variable represents {name} in the P&C insurance context.
+
+It stores important configuration or state information for the insurance processing
+system, reflecting standard values or parameters used in P&C insurance.
+
+This data point is essential for:
+- Supporting insurance calculations
+- Maintaining consistent policy processing
+- Reflecting industry standards for risk assessment
+- Storing key insurance parameters or rates"""
+
+_MOCK_MODULE_TMPL = """This module is part of a Property & Casualty (P&C) insurance system.
+
+It provides functionality for insurance operations, including policy calculations,
+risk assessment, or claims processing. The implementation follows industry
+standards for P&C insurance and includes specialized handling for different
+insurance scenarios.
+
+Key capabilities include:
+- Insurance premium calculations
+- Risk assessment for different property or casualty scenarios
+- Implementation of insurance business rules
+- Support for standard P&C insurance workflows"""
+
+
+def _find_end_marker(text: str, start: int = 0) -> int:
+    """
+    Find the earliest completion ending in text
+    
+    Args:
+        text (str): Text to search
+        start (int): Index to start searching from
+        
+    Returns:
+        int: Index of the earliest end marker, or -1 if there is none
+    """
+    cut = -1
+    for marker in _END_MARKERS:
+        idx = text.find(marker, start)
+        if idx != -1 and (cut == -1 or idx < cut):
+            cut = idx
+    return cut
+
+
+@functools.lru_cache(maxsize=128)
+def _prompt_type(text: str) -> str:
+    """
+    Determine the type of code element a prompt asks about
+    
+    Cached because retries and re-runs send the same prompts again.
+    
+    Args:
+        text (str): Prompt text
+        
+    Returns:
+        str: Prompt type
+    """
+    # The first keyword wins; prompts name their subject before quoting code
+    match = _PROMPT_TYPE_RE.search(text)
+    return match.lastgroup if match else "code"
+
+
+@functools.lru_cache(maxsize=256)
+def _mock_response(kind: str, name: str) -> str:
+    """
+    Render fallback documentation for a code element
+    
+    Args:
+        kind (str): Element type ('class', 'function', 'variable' or 'module')
+        name (str): Element name
+        
+    Returns:
+        str: Mock documentation
+    """
+    if kind == "class":
+        return _MOCK_CLASS_TMPL.format(name=name)
+    elif kind == "function":
+        return _MOCK_FUNCTION_TMPL.format(name=name.replace('_', ' '))
+    elif kind == "variable":
+        return _MOCK_VARIABLE_TMPL.format(name=name.replace('_', ' '))
+    else:
+        return _MOCK_MODULE_TMPL
+
 class MistralHandler(LLMInterface):
     """
     Handler for Mistral models using ctransformers with added chunking support
     """
     
+    # Handler-specific state lives in slots; LLMInterface attributes such as
+    # model and config stay in the instance __dict__
+    __slots__ = (
+        'context_length', 'gpu_layers', 'batch_size',
+        '_system_prompt', '_prompt_prefix', '_prompt_suffix',
+        '_model_file_exists', '_char_budget', '_gen_kwargs',
+        '_executor', '_async_locks',
+    )
+    
     def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None):
         """
         Initialize the Mistral handler
@@ -30,9 +190,37 @@ class MistralHandler(LLMInterface):
         
         # Mistral-specific parameters
         self.context_length = self.config.get('context_length', 4096)
-        self.gpu_layers = self.config.get('gpu_layers', 0)
+        self.gpu_layers = self.config.get('n_gpu_layers', self.config.get('gpu_layers', 0))
         self.batch_size = self.config.get('batch_size', 512)
         
+        # The instruction envelope is fixed after construction; build it once.
+        # Only static text goes in the prefix so it is shared by every prompt.
+        self._system_prompt = self.config.get('system_prompt', _DEFAULT_SYSTEM_PROMPT)
+        self._prompt_prefix = f"<s>[INST] {self._system_prompt}\n\n"
+        self._prompt_suffix = " [/INST]"
+        
+        # Result of the model file check, filled in by load_model
+        self._model_file_exists = None
+        
+        # Prompts longer than this go through _handle_long_prompt; matches the old
+        # half-context word limit at roughly six characters per word
+        self._char_budget = self.context_length * 3
+        
+        # Sampling arguments shared by every model call
+        self._gen_kwargs = {
+            "max_new_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+        
+        # Single worker so streamed generations never run the model concurrently
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mistral-generate")
+        
+        # Serializes agenerate calls that miss the cache; asyncio locks belong
+        # to one event loop, so each loop gets its own
+        self._async_locks = weakref.WeakKeyDictionary()
+        
         # Initialize model on creation if specified
         if self.config.get('load_on_init', True):
             self.load_model()
@@ -49,35 +237,33 @@ class MistralHandler(LLMInterface):
             return True
         
         try:
-            # Check if model file exists
-            if not os.path.exists(self.model_path):
+            # Check if model file exists; the path is fixed, so check only once
+            if self._model_file_exists is None:
+                self._model_file_exists = os.path.exists(self.model_path)
+            if not self._model_file_exists:
                 logger.error(f"Model file not found: {self.model_path}")
                 return False
             
-            # Import ctransformers
-            try:
-                from ctransformers import AutoModelForCausalLM
-                
-                # Log model loading
-                logger.info(f"Loading Mistral model from {self.model_path}...")
-                
-                # Load the model
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_path,
-                    model_type="mistral",
-                    context_length=self.context_length,
-                    gpu_layers=self.gpu_layers
-                )
-                
-                logger.info("Mistral model loaded successfully")
-                return True
-                
-            except ImportError:
+            if not _CT_AVAILABLE:
                 # Fallback to mock mode if ctransformers is not installed
                 logger.warning("ctransformers package not installed. Using mock mode.")
                 logger.warning("Install with: pip install ctransformers")
                 self.model = "MOCK_MODEL"
                 return True
+            
+            # Log model loading
+            logger.info(f"Loading Mistral model from {self.model_path}...")
+            
+            # Load the model
+            self.model = AutoModelForCausalLM.from_pretrained(
+                self.model_path,
+                model_type="mistral",
+                context_length=self.context_length,
+                gpu_layers=self.gpu_layers
+            )
+            
+            logger.info("Mistral model loaded successfully")
+            return True
                 
         except Exception as e:
             logger.error(f"Error loading Mistral model: {str(e)}")
@@ -96,27 +282,55 @@ class MistralHandler(LLMInterface):
         Returns:
             str: Generated text
         """
+        return "".join(self.generate_stream(prompt))
+    
+    def cleanup(self):
+        """
+        Clean up resources, including the generation worker thread
+        """
+        self._executor.shutdown(wait=False)
+        super().cleanup()
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Generate text using Mistral model, yielding it as it is produced
+        
+        The model runs on a worker thread and hands tokens over through a
+        bounded queue, so cleaning and consuming overlap with generation.
+        
+        Args:
+            prompt (str): Input prompt
+            
+        Yields:
+            str: Successive pieces of the cleaned response
+        """
         # Check for cached response
-        cached_response = self.get_cached_response(prompt)
+        prompt_hash = self._hash_prompt(prompt)
+        cached_response = self.get_cached_response(prompt_hash)
         if cached_response is not None:
-            return cached_response
+            yield cached_response
+            return
         
         # Ensure model is loaded
         if self.model is None:
             success = self.load_model()
             if not success:
-                return "Error: Failed to load model."
+                yield "Error: Failed to load model."
+                return
         
+        pieces = []
         try:
             # Check if we're in mock mode
             if self.model == "MOCK_MODEL":
                 # Generate simple documentation based on prompt
-                return self._generate_mock_response(prompt)
+                yield self._generate_mock_response(prompt)
+                return
             
             # Check if the prompt is too long
-            if len(prompt.split()) > (self.context_length / 2):
+            if len(prompt) > self._char_budget:
                 # Use chunking approach for long prompts
-                return self._handle_long_prompt(prompt)
+                yield self._handle_long_prompt(prompt, prompt_hash)
+                return
             
             # Format the prompt
             formatted_prompt = self._format_prompt(prompt)
@@ -126,109 +340,281 @@ class MistralHandler(LLMInterface):
             logger.debug(f"Generating with prompt: {log_prompt}")
             
             try:
-                # Generate the response
-                text = self.model(
-                    formatted_prompt,
-                    max_new_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    top_p=self.top_p
-                )
-                
-                # Clean up response if needed
-                text = self._clean_response(text)
-                
-                # Save to cache
-                self.save_to_cache(prompt, text)
-                
-                return text
+                for piece in self._stream_response(formatted_prompt):
+                    pieces.append(piece)
+                    yield piece
             except Exception as e:
+                if pieces:
+                    # Part of the answer is already out; keep it but don't cache it
+                    logger.warning(f"Generation stopped early: {str(e)}")
+                    return
                 logger.warning(f"Error during generation (likely token overflow): {str(e)}")
                 # Fall back to chunking approach
-                return self._handle_long_prompt(prompt)
+                yield self._handle_long_prompt(prompt, prompt_hash)
+                return
+            
+            # Save to cache
+            self.save_to_cache(prompt_hash, "".join(pieces))
             
         except Exception as e:
             logger.error(f"Error during text generation: {str(e)}")
-            # Fall back to mock response
-            return self._generate_mock_response(prompt)
+            if not pieces:
+                # Fall back to mock response
+                yield self._generate_mock_response(prompt)
+    
+    async def agenerate(self, prompt: str) -> str:
+        """
+        Generate text without blocking the event loop
+        
+        Cache hits return straight away. Other prompts run generate on the
+        default executor, one at a time, so callers can gather many prompts
+        and keep resolving cache hits while the model works.
+        
+        Args:
+            prompt (str): Input prompt
+            
+        Returns:
+            str: Generated text
+        """
+        cached_response = self.get_cached_response(self._hash_prompt(prompt))
+        if cached_response is not None:
+            return cached_response
+        
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            # Created inside the loop so it binds there (Python 3.8)
+            lock = self._async_locks[loop] = asyncio.Lock()
+        
+        async with lock:
+            return await loop.run_in_executor(None, self.generate, prompt)
     
-    def _handle_long_prompt(self, prompt: str) -> str:
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Generate text for several prompts
+        
+        All prompts are hashed and checked against the cache first; the
+        remaining ones are then run back to back without per-prompt logging.
+        ctransformers has no batched completion call for this model type, so
+        the model still sees one prompt at a time.
+        
+        Args:
+            prompts (list): Input prompts
+            
+        Returns:
+            list: Generated text for each prompt, in order
+        """
+        results = [None] * len(prompts)
+        pending = {}
+        for i, prompt in enumerate(prompts):
+            prompt_hash = self._hash_prompt(prompt)
+            cached_response = self.get_cached_response(prompt_hash)
+            if cached_response is not None:
+                results[i] = cached_response
+            else:
+                # Repeated prompts are generated once
+                pending.setdefault(prompt_hash, []).append(i)
+        
+        if not pending:
+            return results
+        
+        # Ensure model is loaded
+        if self.model is None and not self.load_model():
+            for indices in pending.values():
+                for i in indices:
+                    results[i] = "Error: Failed to load model."
+            return results
+        
+        mock = self.model == "MOCK_MODEL"
+        char_budget = self._char_budget
+        invoke = self._invoke
+        format_prompt = self._format_prompt
+        for prompt_hash, indices in pending.items():
+            prompt = prompts[indices[0]]
+            if mock:
+                text = self._generate_mock_response(prompt)
+            elif len(prompt) > char_budget:
+                text = self._handle_long_prompt(prompt, prompt_hash)
+            else:
+                text = invoke(format_prompt(prompt))
+                if text is None:
+                    text = self._handle_long_prompt(prompt, prompt_hash)
+                else:
+                    self.save_to_cache(prompt_hash, text)
+            for i in indices:
+                results[i] = text
+        
+        return results
+    
+    def _handle_long_prompt(self, prompt: str, prompt_hash: Optional[str] = None) -> str:
         """
         Handle long prompts by extracting key parts
         
         Args:
             prompt (str): Original long prompt
+            prompt_hash (str, optional): Cache key of the original prompt
             
         Returns:
             str: Generated response
         """
         logger.info("Handling long prompt through smart extraction")
         
+        if prompt_hash is None:
+            prompt_hash = self._hash_prompt(prompt)
+        
         # Extract key components from the prompt
         code_blocks = self._extract_code_blocks(prompt)
         name = self._extract_name(prompt)
         prompt_type = self._determine_prompt_type(prompt)
         
         # Create a condensed prompt
-        if code_blocks and len(code_blocks) > 0:
+        if code_blocks:
             # Use the first code block (usually contains the function/class definition)
-            condensed_code = code_blocks[0]
-            
             # Generate a shorter prompt with just the essential information
-            condensed_prompt = f"Generate documentation for this {prompt_type}: {name}\n\n"
-            condensed_prompt += f"Here's the essential part of the code:\n\n```python\n{condensed_code}\n```\n\n"
-            condensed_prompt += f"Provide a comprehensive explanation in P&C insurance context."
-            
-            # Try generating with the condensed prompt
-            formatted_prompt = self._format_prompt(condensed_prompt)
-            
-            try:
-                text = self.model(
-                    formatted_prompt,
-                    max_new_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    top_p=self.top_p
-                )
-                
-                text = self._clean_response(text)
-                return text
-            except Exception as e:
-                logger.warning(f"Error during condensed generation: {str(e)}")
-                # Fall back to mock mode
-                return self._generate_mock_response(f"{prompt_type} {name}")
+            reduced_prompt = _CONDENSED_TMPL.format(
+                ptype=prompt_type.capitalize(), name=name, code=code_blocks[0])
         else:
             # If we couldn't extract code blocks, use a very simplified prompt
-            simple_prompt = f"Briefly describe a {prompt_type} named {name} in P&C insurance context."
-            formatted_prompt = self._format_prompt(simple_prompt)
+            reduced_prompt = _SIMPLE_TMPL.format(ptype=prompt_type.capitalize(), name=name)
+        
+        # Long prompts often reduce to the same text, so share its cache entry
+        reduced_hash = self._hash_prompt(reduced_prompt)
+        cached_response = self.get_cached_response(reduced_hash)
+        if cached_response is not None:
+            self.save_to_cache(prompt_hash, cached_response)
+            return cached_response
+        
+        text = self._invoke(self._format_prompt(reduced_prompt))
+        if text is None:
+            # Fall back to mock mode as last resort
+            return self._generate_mock_response(prompt, kind=prompt_type, name=name)
+        
+        self.save_to_cache(prompt_hash, text)
+        self.save_to_cache(reduced_hash, text)
+        return text
+    
+    def _invoke(self, formatted_prompt: str) -> Optional[str]:
+        """
+        Run the model on a formatted prompt
+        
+        Args:
+            formatted_prompt (str): Prompt already wrapped in the instruction envelope
             
-            try:
-                text = self.model(
-                    formatted_prompt,
-                    max_new_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    top_p=self.top_p
-                )
+        Returns:
+            str: Cleaned response, or None if generation failed
+        """
+        try:
+            return self._clean_response(self.model(formatted_prompt, **self._gen_kwargs))
+        except Exception as e:
+            logger.warning(f"Error during generation: {str(e)}")
+            return None
+    
+    def _stream_response(self, formatted_prompt: str) -> Iterator[str]:
+        """
+        Stream a cleaned response for a formatted prompt
+        
+        Joining the pieces gives the same text as _clean_response on the full
+        completion. The tail of the text is held back until it can no longer
+        be the start of an end marker or an [/INST] tag.
+        
+        Args:
+            formatted_prompt (str): Prompt already wrapped in the instruction envelope
+            
+        Yields:
+            str: Successive pieces of the cleaned response
+        """
+        tokens = queue.Queue(maxsize=64)
+        stop = threading.Event()
+        self._executor.submit(self._produce_tokens, formatted_prompt, tokens, stop)
+        
+        get_token = tokens.get
+        raw = ""
+        emitted = 0
+        scanned = 0
+        finished = False
+        try:
+            while True:
+                token = get_token()
+                if token is _STREAM_END:
+                    finished = True
+                    break
+                if isinstance(token, Exception):
+                    raise token
                 
-                text = self._clean_response(text)
-                return text
-            except Exception as e:
-                logger.warning(f"Error during simplified generation: {str(e)}")
-                # Fall back to mock mode as last resort
-                return self._generate_mock_response(f"{prompt_type} {name}")
+                raw += token
+                text = raw.replace("[/INST]", "").lstrip()
+                
+                # Markers starting before the held-back tail were already complete
+                cut = _find_end_marker(text, max(0, scanned - _STREAM_HOLDBACK))
+                if cut != -1:
+                    text = text[:cut].rstrip()
+                    if len(text) > emitted:
+                        yield text[emitted:]
+                    return
+                scanned = len(text)
+                
+                safe = text[:max(0, len(text) - _STREAM_HOLDBACK)].rstrip()
+                if len(safe) > emitted:
+                    yield safe[emitted:]
+                    emitted = len(safe)
+            
+            text = raw.replace("[/INST]", "").strip()
+            if len(text) > emitted:
+                yield text[emitted:]
+        finally:
+            if not finished:
+                # Ask the worker to stop and drain the queue so it is never left blocked
+                stop.set()
+                while tokens.get() is not _STREAM_END:
+                    pass
+    
+    def _produce_tokens(self, formatted_prompt: str, tokens: queue.Queue,
+                        stop: threading.Event):
+        """
+        Run a streaming completion and push its tokens onto a queue
+        
+        Runs on the worker thread. Errors are passed on through the queue, and
+        the queue always ends with _STREAM_END.
+        
+        Args:
+            formatted_prompt (str): Prompt already wrapped in the instruction envelope
+            tokens (queue.Queue): Queue receiving the generated tokens
+            stop (threading.Event): Set by the consumer to end generation early
+        """
+        try:
+            for token in self.model(formatted_prompt, stream=True, **self._gen_kwargs):
+                if stop.is_set():
+                    break
+                tokens.put(token)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            tokens.put(_STREAM_END)
     
     def _extract_code_blocks(self, text: str) -> list:
         """
-        Extract code blocks from markdown text
+        Extract the leading code block from markdown text
+        
+        Only the first block is used when condensing prompts, so scanning
+        stops at the first match.
         
         Args:
             text (str): Text containing markdown code blocks
             
         Returns:
-            list: List of code block contents
+            list: Content of the first code block, or an empty list
         """
-        # Pattern to match code blocks with or without language specifier
-        pattern = r'```(?:python)?\s*([\s\S]*?)```'
-        matches = re.findall(pattern, text)
-        return [match.strip() for match in matches]
+        # Plain substring scans; a regex with a lazy body is slow on multi-MB prompts
+        start = text.find("```")
+        if start == -1:
+            return []
+        start += 3
+        if text.startswith("python", start):
+            start += 6
+        end = text.find("```", start)
+        if end == -1:
+            return []
+        return [text[start:end].strip()]
     
     def _extract_name(self, text: str) -> str:
         """
@@ -241,16 +627,16 @@ class MistralHandler(LLMInterface):
             str: Extracted name or default
         """
         # Try to find name in the text
-        name_match = re.search(r'name:?\s*([^\n\r]+)', text, re.IGNORECASE)
+        name_match = _NAME_RE.search(text)
         if name_match:
             return name_match.group(1).strip()
         
         # Look for class or function name patterns
-        class_match = re.search(r'class\s+(\w+)', text)
+        class_match = _CLASS_RE.search(text)
         if class_match:
             return class_match.group(1)
         
-        func_match = re.search(r'def\s+(\w+)', text)
+        func_match = _FUNC_RE.search(text)
         if func_match:
             return func_match.group(1)
         
@@ -267,18 +653,7 @@ class MistralHandler(LLMInterface):
         Returns:
             str: Prompt type
         """
-        lower_text = text.lower()
-        
-        if "class" in lower_text or "class:" in lower_text:
-            return "class"
-        elif "function" in lower_text or "function:" in lower_text or "def " in lower_text:
-            return "function"
-        elif "variable" in lower_text or "variable:" in lower_text:
-            return "variable"
-        elif "module" in lower_text or "module:" in lower_text:
-            return "module"
-        else:
-            return "code"
+        return _prompt_type(text)
     
     def _format_prompt(self, prompt: str) -> str:
         """
@@ -290,12 +665,8 @@ class MistralHandler(LLMInterface):
         Returns:
             str: Formatted prompt
         """
-        # Use the system prompt template if provided
-        system_prompt = self.config.get('system_prompt', 
-            "You are an expert technical writer specializing in P&C insurance code documentation.")
-        
         # For Mistral Instruct format
-        return f"<s>[INST] {system_prompt}\n\n{prompt} [/INST]"
+        return self._prompt_prefix + prompt + self._prompt_suffix
     
     def _clean_response(self, text: str) -> str:
         """
@@ -311,78 +682,42 @@ class MistralHandler(LLMInterface):
         text = text.replace("[/INST]", "").strip()
         
         # Remove common completion endings
-        end_markers = ["</answer>", "Human:", "User:", "<|user|>", "<|system|>", "\n\n\n"]
-        for marker in end_markers:
-            if marker in text:
-                text = text.split(marker)[0].strip()
+        for marker in _END_MARKERS:
+            idx = text.find(marker)
+            if idx != -1:
+                text = text[:idx].rstrip()
         
         return text
     
-    def _generate_mock_response(self, prompt: str) -> str:
+    def _generate_mock_response(self, prompt: str, *, kind: Optional[str] = None,
+                                name: Optional[str] = None) -> str:
         """
         Generate a mock response when the model is not available
         
         Args:
             prompt (str): Input prompt
+            kind (str, optional): Element type, if already known
+            name (str, optional): Element name, if already known
             
         Returns:
             str: Generated mock response
         """
+        # Callers that already scanned the prompt skip the detection below
+        if kind is not None and name is not None:
+            return _mock_response(kind, name)
+        
         # Check what type of documentation is requested
-        if "class" in prompt.lower():
-            class_name = self._extract_name(prompt)
-            return f"""This class is part of the P&C insurance system.
-
-It provides functionality related to {class_name}, which is an important component
-for managing insurance policies, claims, or risk assessment. In the P&C insurance domain, 
-this handles processes critical to effective insurance operations.
-
-Key features include:
-- Processing and validation of insurance data
-- Support for standard P&C insurance workflows
-- Implementation of business rules for insurance calculations
-- Management of policy or claim information"""
-            
-        elif "function" in prompt.lower():
-            func_name = self._extract_name(prompt)
-            return f"""This function handles {func_name.replace('_', ' ')} operations in the P&C insurance system.
-
-It performs calculations or data processing related to insurance policies or claims,
-ensuring proper validation and compliance with industry standards. The function 
-implements business logic for insurance operations according to P&C practices.
-
-Insurance domain importance:
-- Ensures accurate insurance calculations
-- Supports consistent insurance processing flows
-- Implements industry-standard methods for P&C insurance
-- Provides key functionality for policy or claims management"""
-            
-        elif "variable" in prompt.lower():
-            var_name = self._extract_name(prompt)
-            return f"""This variable represents {var_name.replace('_', ' ')} in the P&C insurance context.
-
-It stores important configuration or state information for the insurance processing
-system, reflecting standard values or parameters used in P&C insurance.
-
-This data point is essential for:
-- Supporting insurance calculations
-- Maintaining consistent policy processing
-- Reflecting industry standards for risk assessment
-- Storing key insurance parameters or rates"""
-            
+        lower_prompt = prompt.lower()
+        if "class" in lower_prompt:
+            kind = "class"
+        elif "function" in lower_prompt:
+            kind = "function"
+        elif "variable" in lower_prompt:
+            kind = "variable"
         else:
-            return """This module is part of a Property & Casualty (P&C) insurance system.
-
-It provides functionality for insurance operations, including policy calculations,
-risk assessment, or claims processing. The implementation follows industry
-standards for P&C insurance and includes specialized handling for different
-insurance scenarios.
-
-Key capabilities include:
-- Insurance premium calculations
-- Risk assessment for different property or casualty scenarios
-- Implementation of insurance business rules
-- Support for standard P&C insurance workflows"""
+            return _mock_response("module", "")
+        
+        return _mock_response(kind, self._extract_name(prompt))
 
 '''
 import logging
@@ -4,22 +4,348 @@ Auto Documentation Generator for P&C Insurance Codebases
 Main entry point for the application
 """
 import argparse
+import ast
 import os
+import re
+import string
 import sys
 import yaml
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 
-from src.code_parser.parser import CodeParserFactory
-from src.llm.llm_interface import LLMFactory
-from src.doc_generator.generator import DocGeneratorFactory
-from src.utils.file_utils import get_files_by_extension, ensure_dir
+from src.utils.file_utils import get_files_by_extension, ensure_dir, get_file_size
 from src.utils.logging_utils import setup_logging
 
+# Use the LibYAML bindings when PyYAML was built with them
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+# Files parsed ahead of the one being documented
+_PARSE_AHEAD = 32
+
+# Rough characters per token, used to size grouped prompts against the context
+_CHARS_PER_TOKEN = 3
+
+# Section markers in batched responses, e.g. "[2] ..."
+_BATCH_MARKER_RE = re.compile(r'^\[(\d+)\][ \t]*', re.MULTILINE)
+
+# Variables shorter than this are documented without asking the LLM
+_TRIVIAL_VARIABLE_CHARS = 16
+
+# Line separating a prompt template's fixed instructions from the element details
+_TEMPLATE_SEPARATOR_RE = re.compile(r'^---[ \t]*$', re.MULTILINE)
+
+# UPPER_CASE assignments; the value must also evaluate as a string or number literal
+_CONSTANT_ASSIGN_RE = re.compile(r'[A-Z][A-Z0-9_]*\s*(?::[^=]*)?=(.*)', re.DOTALL)
+
+def render_batch_item(item, batch_template):
+    """Render one code item's section of a grouped prompt, context included"""
+    _, render_item = batch_template
+    return render_item(
+        code=item.get('code', ''),
+        name=item.get('name', ''),
+        context=item.get('context', '')
+    )
+
+def _batched_prompt_header(instructions, kind):
+    """Return the text opening a grouped prompt"""
+    return (
+        f"{instructions}\n\n"
+        f"The {kind}s below are numbered; document each one separately. "
+        f"Respond with one section per {kind}, in the same order, each starting on a "
+        f"new line with its number in brackets:\n[1] <documentation>\n[2] <documentation>\n\n---\n"
+    )
+
+def build_batched_prompt(sections, kind, batch_template):
+    """
+    Build one prompt asking for documentation of several code items
+    
+    batch_template comes from compile_batch_template: the kind's configured
+    instructions open the prompt, followed by the numbered item sections from
+    render_batch_item.
+    """
+    parts = [_batched_prompt_header(batch_template[0], kind)]
+    for index, section in enumerate(sections, 1):
+        parts.append(f"[{index}] {section}\n\n")
+    return "".join(parts)
+
+def group_batch_items(queued, kind, batch_template, max_items, max_chars):
+    """
+    Split queued (prompt, waiters) pairs into groups that fit one grouped prompt
+    
+    Items are taken in order. A group is closed once it holds max_items or the
+    next item's section would push the prompt past max_chars; an item too
+    large to share a prompt ends up in a group of its own.
+    Returns a list of groups, each a list of (prompt, waiters, section).
+    """
+    def section_chars(number, section):
+        # "[n] " in front of the section and a blank line after it
+        return len(str(number)) + 3 + len(section) + 2
+    
+    header_chars = len(_batched_prompt_header(batch_template[0], kind))
+    groups = []
+    group = []
+    used = header_chars
+    for prompt, waiters in queued:
+        section = render_batch_item(waiters[0][1], batch_template)
+        if group and (len(group) >= max_items
+                      or used + section_chars(len(group) + 1, section) > max_chars):
+            groups.append(group)
+            group = []
+            used = header_chars
+        group.append((prompt, waiters, section))
+        used += section_chars(len(group), section)
+    if group:
+        groups.append(group)
+    return groups
+
+def split_batched_response(response, count):
+    """Split a batched response into per-item sections, or None if it is malformed"""
+    pieces = _BATCH_MARKER_RE.split(response)
+    sections = {}
+    # pieces alternates between text and marker numbers: [lead, n1, text1, n2, text2, ...].
+    # Later sections win, so an echoed "[1] <documentation>" format line is replaced
+    for number, text in zip(pieces[1::2], pieces[2::2]):
+        sections[int(number)] = text.strip()
+    if sorted(sections) != list(range(1, count + 1)) or not all(sections.values()):
+        return None
+    return [sections[index] for index in range(1, count + 1)]
+
+def compile_prompt_template(template):
+    """
+    Compile a str.format prompt template into a renderer taking keyword values
+    
+    The template is split into literal text and fields once, so rendering is a
+    single join. Templates using format specs, conversions or attribute and
+    index lookups fall back to str.format.
+    """
+    parts = []
+    fields = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            return lambda **values: template.format(**values)
+        fields.append((len(parts), field))
+        parts.append('')
+    
+    def render(**values):
+        rendered = parts.copy()
+        for index, field in fields:
+            rendered[index] = str(values[field])
+        return "".join(rendered)
+    
+    return render
+
+def compile_batch_template(template):
+    """
+    Split a prompt template at its last "---" line for use in grouped prompts
+    
+    Returns (instructions, render_item), where render_item renders the
+    per-element part, or None when the template has no separator line or its
+    instructions use fields; such kinds are always sent one element per prompt.
+    """
+    separators = list(_TEMPLATE_SEPARATOR_RE.finditer(template or ''))
+    if not separators:
+        return None
+    instructions = template[:separators[-1].start()].rstrip()
+    if any(field is not None for _, field, _, _ in string.Formatter().parse(instructions)):
+        return None
+    return instructions, compile_prompt_template(template[separators[-1].end():].strip('\n'))
+
+def compile_prompt_templates(prompts):
+    """Compile every prompt template; element kinds without one render as empty text"""
+    templates = {kind: compile_prompt_template('') for kind in ('module', 'class', 'function', 'variable')}
+    for kind, template in prompts.items():
+        templates[kind] = compile_prompt_template(template or '')
+    return templates
+
+def is_literal_constant(code):
+    """Check whether code assigns a string or number literal to an UPPER_CASE name"""
+    match = _CONSTANT_ASSIGN_RE.fullmatch(code)
+    if not match:
+        return False
+    try:
+        value = ast.literal_eval(match.group(1).strip())
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return False
+    return isinstance(value, (str, bytes, int, float)) and not isinstance(value, bool)
+
+def assigns_single_target(code):
+    """Check whether code is one assignment to a single name or attribute"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    if len(tree.body) != 1:
+        return False
+    statement = tree.body[0]
+    if isinstance(statement, ast.Assign):
+        if len(statement.targets) != 1:
+            return False
+        target = statement.targets[0]
+    elif isinstance(statement, (ast.AnnAssign, ast.AugAssign)):
+        target = statement.target
+    else:
+        return False
+    return isinstance(target, (ast.Name, ast.Attribute))
+
+def trivial_variable_doc(var, kind='Variable'):
+    """
+    Return stock documentation for a variable not worth an LLM call, or None
+    
+    kind labels short non-constant names, e.g. 'Attribute' for class-level
+    ones. Tuple unpacking, chained assignments and values the parser could not
+    summarise are left to the LLM.
+    """
+    code = var.get('code', '').strip()
+    if is_literal_constant(code):
+        label = "Constant"
+    elif len(code) < _TRIVIAL_VARIABLE_CHARS:
+        label = kind
+    else:
+        return None
+    
+    value = var.get('value')
+    if not value or not assigns_single_target(code):
+        return None
+    return f"{label} {var.get('name', '')} (value: {value})."
+
+def build_file_jobs(file_path, code_structure, templates, skip_trivial=False):
+    """
+    Build the documentation structure for a parsed file and the prompts it needs
+    
+    templates maps each element kind to a renderer from compile_prompt_templates.
+    With skip_trivial, short variables and literal constants get stock
+    documentation instead of a prompt.
+    Returns (documentation, jobs, skipped). Each job is (node, kind, prompt);
+    kind is 'function' or 'variable' for top-level items that may share a
+    grouped prompt, and None otherwise. skipped counts the variables left
+    out of jobs.
+    """
+    documentation = {}
+    jobs = []
+    skipped = 0
+    
+    # Process module documentation
+    module_info = code_structure.get('module', {})
+    module_code = module_info.get('code', '')
+    module_name = module_info.get('name', os.path.basename(file_path))
+    
+    # Queue module documentation
+    if module_code:
+        prompt = templates['module'](
+            code=module_code,
+            name=module_name,
+            context=''
+        )
+        jobs.append((module_info, None, prompt))
+    
+    documentation['module'] = module_info
+    documentation['imports'] = code_structure.get('imports', [])
+    
+    # Process classes
+    classes = []
+    for cls in code_structure.get('classes', []):
+        # Queue documentation for this class
+        prompt = templates['class'](
+            code=cls.get('code', ''),
+            name=cls.get('name', ''),
+            context=cls.get('context', '')
+        )
+        jobs.append((cls, None, prompt))
+        
+        # Process methods
+        for method in cls.get('methods', []):
+            method_prompt = templates['function'](
+                code=method.get('code', ''),
+                name=method.get('name', ''),
+                context=method.get('context', '')
+            )
+            jobs.append((method, None, method_prompt))
+        
+        # Process attributes
+        for attr in cls.get('attributes', []):
+            if skip_trivial:
+                attr_doc = trivial_variable_doc(attr, 'Attribute')
+                if attr_doc is not None:
+                    attr['documentation'] = attr_doc
+                    skipped += 1
+                    continue
+            
+            attr_prompt = templates['variable'](
+                code=attr.get('code', ''),
+                name=attr.get('name', ''),
+                context=attr.get('context', '')
+            )
+            jobs.append((attr, None, attr_prompt))
+        
+        classes.append(cls)
+    
+    documentation['classes'] = classes
+    
+    # Process functions
+    functions = []
+    for func in code_structure.get('functions', []):
+        # Skip class methods (already processed)
+        if func.get('class_name'):
+            continue
+        
+        # Queue documentation for this function
+        prompt = templates['function'](
+            code=func.get('code', ''),
+            name=func.get('name', ''),
+            context=func.get('context', '')
+        )
+        jobs.append((func, 'function', prompt))
+        functions.append(func)
+    
+    documentation['functions'] = functions
+    
+    # Process variables
+    variables = []
+    for var in code_structure.get('variables', []):
+        # Skip class attributes (already processed)
+        if var.get('class_name'):
+            continue
+        
+        variables.append(var)
+        
+        if skip_trivial:
+            var_doc = trivial_variable_doc(var)
+            if var_doc is not None:
+                var['documentation'] = var_doc
+                skipped += 1
+                continue
+        
+        # Queue documentation for this variable
+        prompt = templates['variable'](
+            code=var.get('code', ''),
+            name=var.get('name', ''),
+            context=var.get('context', '')
+        )
+        jobs.append((var, 'variable', prompt))
+    
+    documentation['variables'] = variables
+    
+    return documentation, jobs, skipped
+
 def load_config(config_path):
     """Load configuration from YAML file"""
     with open(config_path, 'r') as file:
-        return yaml.safe_load(file)
+        return yaml.load(file, Loader=_YamlLoader)
+
+def save_yaml(data, path):
+    """Write data to a YAML file, keeping the key order of the dict"""
+    with open(path, 'w') as file:
+        yaml.dump(data, file, Dumper=_YamlDumper, default_flow_style=False, sort_keys=False)
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -57,6 +383,8 @@ def main():
             "log_file": "logs/auto_doc.log",
             "code_language": "python",
             "file_extensions": [".py", ".java"],
+            "max_file_bytes": 1000000,
+            "skip_trivial_variables": True,
             "output_format": "markdown",
             "generate_index": True,
             "include_examples": True,
@@ -69,13 +397,18 @@ def main():
                 "temperature": 0.2,
                 "top_p": 0.9,
                 "max_tokens": 1024,
-                "cache_dir": "cache"
+                "cache_dir": "cache",
+                # Prompts handed to the backend's generate_batch per call
+                "n_parallel": 4,
+                # llama: keep the KV state of shared prompt prefixes (LlamaRAMCache)
+                "cache_prompt": True,
+                # Layers offloaded to the GPU; -1 offloads every layer
+                "n_gpu_layers": -1
             },
             "prompt_templates": "config/prompt_templates.yaml"
         }
         
-        with open(args.config, 'w') as file:
-            yaml.dump(default_config, file, default_flow_style=False)
+        save_yaml(default_config, args.config)
         
         config = default_config
     
@@ -110,23 +443,37 @@ def main():
         
         os.makedirs(os.path.dirname(config['prompt_templates']), exist_ok=True)
         
+        # Fixed instructions come first so the backend can reuse the cached prefix
         default_prompts = {
-            "class": "Generate documentation for this class: {name}\n\nCode:\n```python\n{code}\n```\n\nProvide a comprehensive explanation of this class's purpose in P&C insurance context.",
-            "function": "Generate documentation for this function: {name}\n\nCode:\n```python\n{code}\n```\n\nProvide a comprehensive explanation with parameters and return values in P&C insurance context.",
-            "module": "Generate documentation for this module:\n\nCode:\n```python\n{code}\n```\n\nProvide a comprehensive explanation of this module's purpose in P&C insurance context.",
-            "variable": "Generate documentation for this variable: {name}\n\nCode:\n```python\n{code}\n```\n\nExplain the purpose and usage in P&C insurance context."
+            "class": "Generate documentation for the class below. Provide a comprehensive explanation of its purpose in P&C insurance context.\n\n---\nName: {name}\n\nCode:\n```python\n{code}\n```",
+            "function": "Generate documentation for the function below. Provide a comprehensive explanation with parameters and return values in P&C insurance context.\n\n---\nName: {name}\n\nCode:\n```python\n{code}\n```",
+            "module": "Generate documentation for the module below. Provide a comprehensive explanation of its purpose in P&C insurance context.\n\n---\nName: {name}\n\nCode:\n```python\n{code}\n```",
+            "variable": "Generate documentation for the variable below. Explain the purpose and usage in P&C insurance context.\n\n---\nName: {name}\n\nCode:\n```python\n{code}\n```"
         }
         
-        with open(config['prompt_templates'], 'w') as file:
-            yaml.dump(default_prompts, file, default_flow_style=False)
+        save_yaml(default_prompts, config['prompt_templates'])
         
         prompts = default_prompts
     else:
         # Load prompt templates
         with open(config['prompt_templates'], 'r') as file:
-            prompts = yaml.safe_load(file)
+            prompts = yaml.load(file, Loader=_YamlLoader)
+    
+    # Parsed once here; every element's prompt is then a join over the pieces
+    templates = compile_prompt_templates(prompts)
+    batch_templates = {
+        kind: compile_batch_template(prompts.get(kind)) for kind in ('function', 'variable')
+    }
+    
+    # Imported here so --help and config errors don't pay for the parser,
+    # LLM and template machinery
+    from src.code_parser.parser import CodeParserFactory
+    from src.llm.llm_interface import LLMFactory
+    from src.doc_generator.generator import DocGeneratorFactory
     
     # Initialize components
+    llm = None
+    doc_generator = None
     try:
         # Initialize code parser based on language
         parser_factory = CodeParserFactory()
@@ -148,135 +495,199 @@ def main():
             template_dir=config.get('template_dir')
         )
         
-        # Get all source files
+        # Source files are discovered lazily, so enumeration overlaps with parsing
+        # and documentation instead of finishing first
         source_files = get_files_by_extension(
             config['input_dir'], 
             extensions=config['file_extensions']
         )
+        files_found = 0
         
-        logger.info(f"Found {len(source_files)} source files to process")
+        max_file_bytes = config.get('max_file_bytes', 1_000_000)
         
-        # Process each file
-        for file_path in source_files:
+        def parse_source(file_path):
+            """Parse one source file, or return None if it is skipped"""
             logger.info(f"Processing file: {file_path}")
             
-            # Parse code structure
-            code_structure = parser.parse_file(file_path)
+            # Very large (usually generated) files would only be truncated by the model
+            file_size = get_file_size(file_path)
+            if max_file_bytes and file_size is not None and file_size > max_file_bytes:
+                logger.warning(f"Skipping {file_path}: {file_size} bytes exceeds max_file_bytes ({max_file_bytes})")
+                return None
             
-            # Generate documentation using the LLM
-            documentation = {}
-            
-            # Process module documentation
-            module_info = code_structure.get('module', {})
-            module_code = module_info.get('code', '')
-            module_name = module_info.get('name', os.path.basename(file_path))
+            return parser.parse_file(file_path)
+        
+        # Documentation of files not yet handed to the renderer; entries are
+        # dropped once rendering is submitted so memory stays bounded by the
+        # files in flight, not the whole tree
+        file_docs = {}
+        documented_files = []
+        
+        # Code elements of each file still waiting for documentation
+        outstanding = {}
+        
+        # Files whose documentation is complete are rendered on render_pool
+        worker_count = min(32, (os.cpu_count() or 1) * 4)
+        render_futures = []
+        
+        def element_done(relative_path):
+            outstanding[relative_path] -= 1
+            if not outstanding[relative_path]:
+                del outstanding[relative_path]
+                render_futures.append(render_pool.submit(
+                    doc_generator.generate, relative_path, file_docs.pop(relative_path)))
+        
+        # Prompts waiting for the LLM, mapped to the (relative_path, node) pairs
+        # asking for them. Identical prompts (boilerplate __init__ methods,
+        # logger variables, ...) are sent once and the answer is shared.
+        jobs = {}
+        
+        # Small functions and variables are documented several per prompt
+        batch_items = {'function': {}, 'variable': {}}
+        prompt_batch_size = config.get('prompt_batch_size', 4)
+        batch_size = max(1, config['llm'].get('n_parallel', 4))
+        
+        # Grouped prompts must leave room in the context for the answer
+        grouped_prompt_chars = _CHARS_PER_TOKEN * max(
+            0, config['llm'].get('context_length', 4096) - config['llm'].get('max_tokens', 1024))
+        
+        # Short variables and literal constants get stock documentation
+        skip_trivial = config.get('skip_trivial_variables', True)
+        trivial_skipped = 0
+        
+        def add_job(pending, prompt, waiters):
+            pending.setdefault(prompt, []).extend(waiters)
+        
+        def take(pending, count):
+            taken = list(islice(pending.items(), count))
+            for prompt, _ in taken:
+                del pending[prompt]
+            return taken
+        
+        def finish(waiters, doc_content):
+            for relative_path, node in waiters:
+                node['documentation'] = doc_content
+                element_done(relative_path)
+        
+        def run_grouped(final):
+            for kind, items in batch_items.items():
+                chunk_size = prompt_batch_size * batch_size
+                while len(items) >= chunk_size or (final and items):
+                    chunk = take(items, chunk_size)
+                    
+                    # A lone item, leftover or too large to share, keeps its own prompt
+                    groups = []
+                    for group in group_batch_items(chunk, kind, batch_templates[kind],
+                                                   prompt_batch_size, grouped_prompt_chars):
+                        if len(group) == 1:
+                            prompt, waiters, _ = group[0]
+                            add_job(jobs, prompt, waiters)
+                        else:
+                            groups.append(group)
+                    if not groups:
+                        continue
+                    
+                    results = llm.generate_batch([
+                        build_batched_prompt([section for _, _, section in group], kind, batch_templates[kind])
+                        for group in groups
+                    ])
+                    for group, response in zip(groups, results):
+                        sections = split_batched_response(response, len(group))
+                        if sections is None:
+                            # Unusable answer; document these items one by one instead
+                            for prompt, waiters, _ in group:
+                                add_job(jobs, prompt, waiters)
+                            continue
+                        for (_, waiters, _), doc_content in zip(group, sections):
+                            finish(waiters, doc_content)
+        
+        def run_jobs(final):
+            while len(jobs) >= batch_size or (final and jobs):
+                batch = take(jobs, batch_size)
+                results = llm.generate_batch([prompt for prompt, _ in batch])
+                for (_, waiters), doc_content in zip(batch, results):
+                    finish(waiters, doc_content)
+        
+        # Files are parsed on a thread pool a few steps ahead of the LLM. Results
+        # are taken in order, and the window bounds how far parsing runs ahead.
+        with ThreadPoolExecutor(max_workers=worker_count) as render_pool, \
+                ThreadPoolExecutor(max_workers=worker_count) as parse_pool:
+            in_flight = deque()
             
-            # Generate module documentation
-            if module_code:
-                prompt = prompts.get('module', '').format(
-                    code=module_code,
-                    name=module_name,
-                    context=''
-                )
-                
-                module_doc = llm.generate(prompt)
-                module_info['documentation'] = module_doc
+            def parse_next():
+                nonlocal files_found
+                for file_path in source_files:
+                    files_found += 1
+                    if not files_found % 500:
+                        logger.info(f"Found {files_found} source files so far")
+                    in_flight.append((file_path, parse_pool.submit(parse_source, file_path)))
+                    return
             
-            documentation['module'] = module_info
-            documentation['imports'] = code_structure.get('imports', [])
+            for _ in range(_PARSE_AHEAD):
+                parse_next()
             
-            # Process classes
-            classes = []
-            for cls in code_structure.get('classes', []):
-                # Generate documentation for this class
-                prompt = prompts.get('class', '').format(
-                    code=cls.get('code', ''),
-                    name=cls.get('name', ''),
-                    context=cls.get('context', '')
-                )
-                
-                doc_content = llm.generate(prompt)
-                cls['documentation'] = doc_content
-                
-                # Process methods
-                for method in cls.get('methods', []):
-                    method_prompt = prompts.get('function', '').format(
-                        code=method.get('code', ''),
-                        name=method.get('name', ''),
-                        context=method.get('context', '')
-                    )
+            try:
+                while in_flight:
+                    file_path, future = in_flight.popleft()
+                    parse_next()
+                    code_structure = future.result()
+                    if code_structure is None:
+                        continue
                     
-                    method_doc = llm.generate(method_prompt)
-                    method['documentation'] = method_doc
-                
-                # Process attributes
-                for attr in cls.get('attributes', []):
-                    attr_prompt = prompts.get('variable', '').format(
-                        code=attr.get('code', ''),
-                        name=attr.get('name', ''),
-                        context=attr.get('context', '')
+                    relative_path = os.path.relpath(file_path, config['input_dir'])
+                    documentation, file_jobs, skipped = build_file_jobs(
+                        file_path, code_structure, templates, skip_trivial
                     )
+                    trivial_skipped += skipped
+                    file_docs[relative_path] = documentation
+                    documented_files.append(relative_path)
+                    outstanding[relative_path] = len(file_jobs) + 1
                     
-                    attr_doc = llm.generate(attr_prompt)
-                    attr['documentation'] = attr_doc
-                
-                classes.append(cls)
-            
-            documentation['classes'] = classes
-            
-            # Process functions
-            functions = []
-            for func in code_structure.get('functions', []):
-                # Skip class methods (already processed)
-                if func.get('class_name'):
-                    continue
-                
-                # Generate documentation for this function
-                prompt = prompts.get('function', '').format(
-                    code=func.get('code', ''),
-                    name=func.get('name', ''),
-                    context=func.get('context', '')
-                )
-                
-                doc_content = llm.generate(prompt)
-                func['documentation'] = doc_content
-                functions.append(func)
-            
-            documentation['functions'] = functions
-            
-            # Process variables
-            variables = []
-            for var in code_structure.get('variables', []):
-                # Skip class attributes (already processed)
-                if var.get('class_name'):
-                    continue
-                
-                # Generate documentation for this variable
-                prompt = prompts.get('variable', '').format(
-                    code=var.get('code', ''),
-                    name=var.get('name', ''),
-                    context=var.get('context', '')
-                )
+                    for node, kind, prompt in file_jobs:
+                        # Only items leaving room for at least one more in the prompt are grouped
+                        if (kind and batch_templates[kind] and prompt_batch_size > 1
+                                and 2 * len(prompt) <= grouped_prompt_chars):
+                            add_job(batch_items[kind], prompt, [(relative_path, node)])
+                        else:
+                            add_job(jobs, prompt, [(relative_path, node)])
+                    
+                    # Released here so files without prompts are written straight away
+                    element_done(relative_path)
+                    
+                    run_grouped(final=False)
+                    run_jobs(final=False)
                 
-                doc_content = llm.generate(prompt)
-                var['documentation'] = doc_content
-                variables.append(var)
-            
-            documentation['variables'] = variables
-            
-            # Generate the output documentation
-            relative_path = os.path.relpath(file_path, config['input_dir'])
-            doc_generator.generate(relative_path, documentation)
+                # Grouped prompts go first so their fallbacks join the last batches
+                run_grouped(final=True)
+                run_jobs(final=True)
+            finally:
+                # Don't leave parses running if the LLM stage failed
+                for _, future in in_flight:
+                    future.cancel()
+        
+        # Re-raise any error from rendering the documentation files
+        for future in render_futures:
+            future.result()
+        
+        logger.info(f"Processed {files_found} source files")
+        if trivial_skipped:
+            logger.info(f"Documented {trivial_skipped} trivial variables without the LLM")
         
         # Generate index file if needed
         if config.get('generate_index', True):
-            doc_generator.generate_index(config['project_name'], source_files)
+            doc_generator.generate_index(config['project_name'], documented_files)
         
         logger.info(f"Documentation generation completed successfully!")
         
     except Exception as e:
         logger.error(f"Error during execution: {str(e)}", exc_info=True)
         return 1
+    finally:
+        # Wait for queued documentation files to reach disk
+        if doc_generator is not None:
+            doc_generator.flush()
+        if llm is not None:
+            llm.cleanup()
     
     return 0
 
@@ -3,41 +3,64 @@ File Utility Functions
 """
 import os
 import logging
-from typing import List, Optional
+import threading
+from typing import Iterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
-def get_files_by_extension(directory: str, extensions: List[str]) -> List[str]:
+# Directories already created by ensure_dir
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+def get_files_by_extension(directory: str, extensions: List[str]) -> Iterator[str]:
     """
     Get all files with specific extensions in a directory (recursive)
     
+    Paths are yielded as they are found, files of a directory before those
+    of its subdirectories. Extensions are matched case-insensitively, as
+    with os.path.splitext on the lowercased name.
+    
     Args:
         directory (str): Directory to search
         extensions (list): List of file extensions to include
         
-    Returns:
-        list: List of file paths
+    Yields:
+        str: Path of each matching file
     """
-    if not os.path.exists(directory):
+    if not os.path.isdir(directory):
         logger.warning(f"Directory does not exist: {directory}")
-        return []
+        return
     
-    # Normalize extensions
-    normalized_exts = [ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in extensions]
-    logger.debug(f"Looking for files with extensions: {normalized_exts}")
+    # Normalize extensions once; a tuple lets str.endswith test them all at once
+    normalized_exts = tuple(sorted({ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in extensions}))
+    logger.debug(f"Looking for files with extensions: {list(normalized_exts)}")
+    if not normalized_exts:
+        return
     
-    files = []
+    # Only the short tail of each name needs lowercasing
+    width = max(map(len, normalized_exts))
     
-    # Walk through directory
-    for root, _, filenames in os.walk(directory):
-        for filename in filenames:
-            _, ext = os.path.splitext(filename)
-            if ext.lower() in normalized_exts:
-                file_path = os.path.join(root, filename)
-                files.append(file_path)
-    
-    logger.debug(f"Found {len(files)} files with specified extensions")
-    return files
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, don't descend into symlinked directories
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif entry.name[-width:].lower().endswith(normalized_exts):
+                        # Rare path: leading dots belong to the name, so ".py" has no extension
+                        if os.path.splitext(entry.name)[1].lower() in normalized_exts:
+                            yield entry.path
+        except OSError as e:
+            # os.walk skips unreadable directories too
+            logger.debug(f"Skipping directory {current}: {str(e)}")
+        
+        # Reversed so subdirectories are visited in the order they were listed
+        stack.extend(reversed(subdirs))
 
 def ensure_dir(directory: str) -> None:
     """
@@ -46,9 +69,13 @@ def ensure_dir(directory: str) -> None:
     Args:
         directory (str): Directory path
     """
-    if not os.path.exists(directory):
-        logger.debug(f"Creating directory: {directory}")
-        os.makedirs(directory, exist_ok=True)
+    # Output files share a handful of directories; create each one only once
+    if directory in _ensured:
+        return
+    with _ensured_lock:
+        if directory not in _ensured:
+            os.makedirs(directory, exist_ok=True)
+            _ensured.add(directory)
 
 def read_file(file_path: str, encoding: str = 'utf-8') -> Optional[str]:
     """
@@ -61,13 +88,12 @@ def read_file(file_path: str, encoding: str = 'utf-8') -> Optional[str]:
     Returns:
         str or None: File contents or None if error
     """
-    if not os.path.exists(file_path):
-        logger.warning(f"File does not exist: {file_path}")
-        return None
-    
     try:
         with open(file_path, 'r', encoding=encoding) as file:
             return file.read()
+    except FileNotFoundError:
+        logger.warning(f"File does not exist: {file_path}")
+        return None
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {str(e)}")
         return None
@@ -112,10 +138,6 @@ def copy_file(src_path: str, dst_path: str) -> bool:
     """
     import shutil
     
-    if not os.path.exists(src_path):
-        logger.warning(f"Source file does not exist: {src_path}")
-        return False
-    
     try:
         # Ensure destination directory exists
         directory = os.path.dirname(dst_path)
@@ -125,6 +147,9 @@ def copy_file(src_path: str, dst_path: str) -> bool:
         shutil.copy2(src_path, dst_path)
         logger.debug(f"Successfully copied {src_path} to {dst_path}")
         return True
+    except FileNotFoundError:
+        logger.warning(f"Source file does not exist: {src_path}")
+        return False
     except Exception as e:
         logger.error(f"Error copying file from {src_path} to {dst_path}: {str(e)}")
         return False
@@ -152,12 +177,11 @@ def get_file_size(file_path: str) -> Optional[int]:
     Returns:
         int or None: File size in bytes or None if error
     """
-    if not os.path.exists(file_path):
+    try:
+        return os.stat(file_path).st_size
+    except FileNotFoundError:
         logger.warning(f"File does not exist: {file_path}")
         return None
-    
-    try:
-        return os.path.getsize(file_path)
     except Exception as e:
         logger.error(f"Error getting file size for {file_path}: {str(e)}")
         return None
\ No newline at end of file
@@ -1,7 +1,9 @@
 """
 Logging Utility Functions
 """
+import atexit
 import logging
+import logging.handlers
 import os
 import sys
 from datetime import datetime
@@ -36,10 +38,18 @@ def setup_logging(log_level: int = logging.INFO, log_file: Optional[str] = None)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
         
-        file_handler = logging.FileHandler(log_file)
+        # The file is opened on the first flush; records are buffered in memory
+        # and written in chunks, or immediately for errors
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=50_000_000, backupCount=3, encoding='utf-8', delay=True)
         file_handler.setLevel(log_level)
         file_handler.setFormatter(file_format)
-        root_logger.addHandler(file_handler)
+        
+        memory_handler = logging.handlers.MemoryHandler(
+            capacity=1024, flushLevel=logging.ERROR, target=file_handler)
+        memory_handler.setLevel(log_level)
+        root_logger.addHandler(memory_handler)
+        atexit.register(memory_handler.flush)
     
     # Log setup information
     logging.info(f"Logging initialized at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -0,0 +1,44 @@
+"""
+Tests for the Llama handler's streamed response handling
+"""
+import unittest
+
+from src.llm.llama_handler import LlamaHandler
+
+
+def _stream(tokens):
+    """Wrap tokens the way create_completion(stream=True) yields them"""
+    return ({"choices": [{"text": token}]} for token in tokens)
+
+
+class CollectStreamTest(unittest.TestCase):
+    """_collect_stream must stop only where _clean_response would cut"""
+    
+    def setUp(self):
+        self.handler = LlamaHandler("missing.gguf", {"load_on_init": False, "use_cache": False})
+    
+    def _generate(self, tokens):
+        return self.handler._clean_response(self.handler._collect_stream(_stream(tokens)).strip())
+    
+    def test_leading_blank_lines_do_not_end_stream(self):
+        tokens = ["\n", "\n", "\n", "The", " class", " computes", " premiums", " for",
+                  " policies", " and", " applies", " discounts", "."]
+        self.assertEqual(self._generate(tokens),
+                         "The class computes premiums for policies and applies discounts.")
+    
+    def test_inst_tag_before_blank_lines_is_ignored(self):
+        tokens = ["[/INST]", "\n\n", "\n", "Returns", " the", " total", " premium",
+                  " for", " the", " policy", "."]
+        self.assertEqual(self._generate(tokens), "Returns the total premium for the policy.")
+    
+    def test_stops_at_end_marker(self):
+        tokens = ["Computes", " the", " premium", ".", "\n\n", "\n", "User", ":"] + ["x"] * 50
+        stream = _stream(tokens)
+        text = self.handler._collect_stream(stream)
+        self.assertEqual(self.handler._clean_response(text.strip()), "Computes the premium.")
+        # Decoding stopped before the stream ran out
+        self.assertIsNotNone(next(stream, None))
+
+
+if __name__ == "__main__":
+    unittest.main()